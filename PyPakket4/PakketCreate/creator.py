@@ -6,10 +6,11 @@ import hashlib
 
 import msgpack
 from tempfile import gettempdir
+from concurrent.futures import ThreadPoolExecutor
 
 from ..PakketShared.logger import Logger,INFO,WARNING,ERROR,DEBUG
 from ..PakketShared.crypto_aes import encrypt,gen_iv
-from ..PakketShared.constants import MAGIC_NUM,MAGIC_NUM_LEN,VERSION
+from ..PakketShared.constants import MAGIC_NUM,MAGIC_NUM_LEN,VERSION,PACKAGE_ID_LEN,MAX_VOLUMES
 from ..PakketShared.compression import deflate
 from ..PakketShared.pp4time import get_POSIX_timestamp
 from .exceptions import *
@@ -65,52 +66,65 @@ class Creator:
 
         self.logger.log("Creator with directory ' {} ' initialised!".format(os.path.basename(target_dir)))
 
-    def create_package_file(self,out_path,encryption_key=None,metadata=None,allow_overwrite=False, file_write_chunk_size = 2048, overwrite_timestamp=None):
+    def _plan_volumes(self,volumes=1,volume_input_size=None):
 
         """
 
-        Extract files from loaded package file to a directory
+        Divide files over volumes, never creates empty volumes (except a single one for an empty directory)
 
-        :param out_path: Path to output file
-        :type out_path: any path-like object/string
-        :param encryption_key: Encryption key, blank for no encryption
-        :type encryption_key: string
-        :param metadata: Optional extra metadata
-        :type metadata: Any object serializable by msgpack, usually dict
-        :param allow_overwrite: Allow overwrite if output file already exists
-        :param file_write_chunk_size: Chunk size per write
-        :param overwrite_timestamp: When given, sets creation time of package to given int (number of seconds since unix epoch), does NOT overwrite file modification times
-        :return: None
+        :param volumes: Amount of volumes to shard files across, capped at the amount of files, files are balanced by size (ignored when volume_input_size is given)
+        :param volume_input_size: Soft target for the sum of original (uncompressed) file sizes per volume, a new volume is started when the next file doesn't fit, files are never split
+        :return: List of lists of file indices, one list per volume
         """
 
-        if self.closed:
+        files = self.target_dir_contents['files']
 
-            raise CreatorClosedError("Can't extract with closed Creator object")
+        if volume_input_size:
 
-        if os.path.exists(out_path) and not allow_overwrite:
+            plan = [[]]
+            cur_size = 0
 
-            raise FileExistsError("Output file already exists")
+            for filen,file in enumerate(files):
 
-        elif os.path.exists(out_path) and allow_overwrite:
+                if plan[-1] and cur_size + file['size'] > volume_input_size:
+                    plan.append([])
+                    cur_size = 0
 
-            with open(out_path,'wb') as f:
-                pass
+                plan[-1].append(filen)
+                cur_size += file['size']
 
-        if encryption_key:
+            return plan
 
-            self.logger.log("Encryption enabled!",WARNING)
+        plan = [[] for _ in range(max(1,min(volumes,len(files))))]
+        loads = [0]*len(plan)
 
-        with open(out_path,'ab') as f:
+        for filen in sorted(range(len(files)),key=lambda i: files[i]['size'],reverse=True):
 
-            f.write(MAGIC_NUM)
+            v = loads.index(min(loads))
+            plan[v].append(filen)
+            loads[v] += files[filen]['size']
 
-            self.logger.log("PyPakket4 magic number written to package file",DEBUG)
+        return [sorted(p) for p in plan]
 
-            self.IV = gen_iv()
+    def _write_volume(self,volume_path,volume_id,file_indices,encryption_key,file_write_chunk_size):
 
-            for filen,file in enumerate(self.target_dir_contents['files']):
+        """
 
-                self.target_dir_contents['files'][filen]['base_offset_start'] = f.tell()
+        Write data region of one volume, meant to be run by a volume worker thread
+
+        :param volume_path: Path to volume file, magic number and package id should already be written
+        :param volume_id: Index of volume in volume table
+        :param file_indices: Indices of files in self.target_dir_contents['files'] to write to this volume
+        """
+
+        with open(volume_path,'ab') as f:
+
+            for n,filen in enumerate(file_indices):
+
+                file = self.target_dir_contents['files'][filen]
+
+                file['volume_id'] = volume_id
+                file['base_offset_start'] = f.tell()
 
                 with open(file['abs_path'],'rb') as ff:
 
@@ -122,7 +136,7 @@ class Creator:
 
                     ts = 0
 
-                    self.target_dir_contents['files'][filen]['chunksizes'] = []
+                    file['chunksizes'] = []
 
                     while len(d) > 0:
 
@@ -138,18 +152,85 @@ class Creator:
                             dc = encrypt(dc, encryption_key, self.IV)
                         ts += len(dc)
 
-                        self.target_dir_contents['files'][filen]['chunksizes'].append(len(dc))
+                        file['chunksizes'].append(len(dc))
 
                         f.write(dc)
                         f.flush()
 
-                    self.target_dir_contents['files'][filen]['compressed_size'] = ts
-                    self.target_dir_contents['files'][filen]['hash'] = h.digest()
+                    file['compressed_size'] = ts
+                    file['hash'] = h.digest()
 
-                self.logger.log("<< {}/{} - {}% >> File ' {} ' has been written to package file".format(filen+1,len(self.target_dir_contents['files']),int((filen+1)/len(self.target_dir_contents['files'])*100),file['name']))
+                self.logger.log("<< VOLUME {} : {}/{} - {}% >> File ' {} ' has been written to package file".format(volume_id,n+1,len(file_indices),int((n+1)/len(file_indices)*100),file['name']))
 
                 f.write(h.digest())
 
+    def create_package_file(self,out_path,encryption_key=None,metadata=None,allow_overwrite=False, file_write_chunk_size = 2048, overwrite_timestamp=None, volumes=1, volume_input_size=None, volume_dirs=None, max_workers=4):
+
+        """
+
+        Extract files from loaded package file to a directory
+
+        :param out_path: Path to output file
+        :type out_path: any path-like object/string
+        :param encryption_key: Encryption key, blank for no encryption
+        :type encryption_key: string
+        :param metadata: Optional extra metadata
+        :type metadata: Any object serializable by msgpack, usually dict
+        :param allow_overwrite: Allow overwrite if output file already exists
+        :param file_write_chunk_size: Chunk size per write
+        :param overwrite_timestamp: When given, sets creation time of package to given int (number of seconds since unix epoch), does NOT overwrite file modification times
+        :param volumes: Amount of volume files to shard files across (at most one per file and at most MAX_VOLUMES), ' out_path ' is always the first volume and holds the file header
+        :param volume_input_size: When given, split package into volumes holding roughly this many bytes of original (uncompressed) file data, files are never split so a volume can be bigger, overrides ' volumes '
+        :param volume_dirs: List of directories to place extra volumes in (round robin), blank to place them next to ' out_path '
+        :param max_workers: Maximum amount of volumes written concurrently, each worker writes its volumes one after another, keep this around the amount of disks in ' volume_dirs '
+        :return: None
+        """
+
+        if self.closed:
+
+            raise CreatorClosedError("Can't extract with closed Creator object")
+
+        plan = self._plan_volumes(volumes,volume_input_size)
+
+        if len(plan) > MAX_VOLUMES:
+
+            raise TooManyVolumesError("Package would need {} volumes but at most {} are supported, lower ' volumes ' or increase ' volume_input_size '".format(len(plan),MAX_VOLUMES))
+
+        volume_names = [os.path.basename(out_path)] + ["{}.v{:03d}".format(os.path.basename(out_path),v) for v in range(1,len(plan))]
+        volume_paths = [out_path] + [os.path.join(volume_dirs[(v-1) % len(volume_dirs)] if volume_dirs else os.path.dirname(out_path),volume_names[v]) for v in range(1,len(plan))]
+
+        for volume_path in volume_paths:
+
+            if os.path.exists(volume_path) and not allow_overwrite:
+
+                raise FileExistsError("Output file already exists")
+
+        if encryption_key:
+
+            self.logger.log("Encryption enabled!",WARNING)
+
+        self.package_id = os.urandom(PACKAGE_ID_LEN)
+
+        for volume_path in volume_paths:
+
+            with open(volume_path,'wb') as f:
+
+                f.write(MAGIC_NUM)
+                f.write(self.package_id)
+
+        self.logger.log("PyPakket4 magic number and package id written to {} volume file(s)".format(len(volume_paths)),DEBUG)
+
+        self.IV = gen_iv()
+
+        with ThreadPoolExecutor(max_workers=max(1,min(max_workers,len(volume_paths)))) as executor:
+
+            futures = [executor.submit(self._write_volume,volume_paths[v],v,plan[v],encryption_key,file_write_chunk_size) for v in range(len(plan))]
+
+            for future in futures:
+                future.result()
+
+        with open(out_path,'ab') as f:
+
             header_offset = f.tell()
 
             f.write(VERSION.to_bytes(2,'little'))
@@ -185,6 +266,15 @@ class Creator:
                 self.logger.log("Directory ' {} ' has been written to file header".format(dir))
 
 
+            f.write(encrypt(len(volume_names).to_bytes(2, 'little'),encryption_key,self.IV))
+            f.write(encrypt(self.package_id,encryption_key,self.IV))
+
+            for volume_name in volume_names:
+                f.write(encrypt(len(volume_name.encode('utf-8')).to_bytes(1, "little"),encryption_key,self.IV))
+                f.write(encrypt(volume_name.encode('utf-8'),encryption_key,self.IV))
+
+                self.logger.log("Volume ' {} ' has been written to file header".format(volume_name))
+
             f.write(encrypt(len(self.target_dir_contents['files']).to_bytes(6, 'little'),encryption_key,self.IV))
 
             for file in self.target_dir_contents['files']:
@@ -211,6 +301,9 @@ class Creator:
                 file_entry += encrypt(file['base_offset_start'].to_bytes(8, 'little'),encryption_key,self.IV)
                 self.logger.log("Base offset of file ' {} ' added to file entry".format(file['name']), DEBUG)
 
+                file_entry += encrypt(file['volume_id'].to_bytes(2, 'little'),encryption_key,self.IV)
+                self.logger.log("Volume id of file ' {} ' added to file entry".format(file['name']), DEBUG)
+
                 f.write(file_entry)
 
                 f.write(len(file['chunksizes']).to_bytes(6,'little'))
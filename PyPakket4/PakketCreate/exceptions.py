@@ -1,3 +1,6 @@
 
 class CreatorClosedError(Exception):
+    pass
+
+class TooManyVolumesError(Exception):
     pass
\ No newline at end of file
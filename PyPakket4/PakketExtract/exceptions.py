@@ -9,4 +9,10 @@ class HashMismatchError(Exception):
     pass
 
 class ExtractorClosedError(Exception):
+    pass
+
+class MissingVolumeError(Exception):
+    pass
+
+class VolumeMismatchError(Exception):
     pass
\ No newline at end of file
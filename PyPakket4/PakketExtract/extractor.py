@@ -1,15 +1,18 @@
 
+import io
 import os
 import random
 import time
+import fnmatch
 import hashlib
 
 import pprint
 import msgpack
 from tempfile import gettempdir
+from concurrent.futures import ThreadPoolExecutor
 
 from ..PakketShared.logger import Logger,INFO,WARNING,ERROR,DEBUG
-from ..PakketShared.constants import MAGIC_NUM,MAGIC_NUM_LEN,VERSION
+from ..PakketShared.constants import MAGIC_NUM,MAGIC_NUM_LEN,VERSION,COMPATIBLE_VERSIONS,PACKAGE_ID_LEN
 from ..PakketShared.compression import inflate
 from ..PakketShared.crypto_aes import decrypt
 from ..PakketShared.pp4time import from_POSIX_timestamp,current_timestamp
@@ -17,7 +20,7 @@ from ..PakketExtract.exceptions import *
 
 class Extractor:
 
-    def __init__(self, target_package, crypto_key = None, print_logs=True, print_debug_logs=False, stealth=False, logger_cleanup=True, skip_version_check=False):
+    def __init__(self, target_package, crypto_key = None, print_logs=True, print_debug_logs=False, stealth=False, logger_cleanup=True, skip_version_check=False, volume_dirs=None):
 
         """
 
@@ -28,7 +31,8 @@ class Extractor:
         :param print_debug_logs: Whether to print debug logs
         :param stealth: If true, logs don't get printed or saved to a file, no log file is created.
         :param logger_cleanup: Whether to delete logfile when logger.close method is called
-        :param skip_version_check: Skip checking 16-bit version end included in file header, if set to False, Extractor raises PyPakket4.PakketExtract.exceptions.VersionMismatchError
+        :param skip_version_check: Skip checking 16-bit version end included in file header, if set to False and version isn't in COMPATIBLE_VERSIONS, Extractor raises PyPakket4.PakketExtract.exceptions.VersionMismatchError
+        :param volume_dirs: List of directories to search for extra volume files, blank to only look next to ' target_package ', volumes are only looked up once a selected file needs them, if a volume can't be found PyPakket4.PakketExtract.exceptions.MissingVolumeError is raised
 
         """
 
@@ -64,7 +68,7 @@ class Extractor:
 
             self.version = int.from_bytes(f.read(2),'little')
 
-            if self.version != VERSION:
+            if self.version not in COMPATIBLE_VERSIONS:
                 if not skip_version_check:
 
                     self.logger.log("Mismatching versions: PACKAGE: {}, PYPAKKET4: {}\n\tCannot proceed, to override version check set ' skip_version_check ' to True ".format(self.version,VERSION))
@@ -116,6 +120,28 @@ class Extractor:
 
                 self.logger.log("Found directory ' {} ' in file header".format(dirn))
 
+            self.volume_names = [os.path.basename(self.target_package)]
+            self.volume_dirs = volume_dirs
+            self.package_id = None
+
+            # First volume is always the package file itself, which may have been renamed
+            self._volume_paths = {0: self.target_package}
+
+            if self.version >= 4:
+
+                amount_volumes = int.from_bytes(decrypt(f.read(2),crypto_key,self.IV),'little')
+                self.package_id = decrypt(f.read(PACKAGE_ID_LEN),crypto_key,self.IV)
+
+                for voln_id in range(amount_volumes):
+
+                    voln_size = int.from_bytes(decrypt(f.read(1),crypto_key,self.IV),'little')
+                    voln = decrypt(f.read(voln_size),crypto_key,self.IV).decode('utf-8')
+
+                    if voln_id > 0:
+                        self.volume_names.append(voln)
+
+                    self.logger.log("Found volume ' {} ' in file header".format(voln))
+
             amount_files = int.from_bytes(decrypt(f.read(6),crypto_key,self.IV),'little')
             for _ in range(amount_files):
 
@@ -136,6 +162,8 @@ class Extractor:
 
                 fileo['base_offset_start'] = int.from_bytes(decrypt(f.read(8),crypto_key,self.IV),'little')
 
+                fileo['volume_id'] = int.from_bytes(decrypt(f.read(2),crypto_key,self.IV),'little') if self.version >= 4 else 0
+
                 fileo['chunksizes'] = []
                 for _ in range(int.from_bytes(f.read(6),'little')):
                     fileo['chunksizes'].append(int.from_bytes(f.read(2),'little'))
@@ -148,64 +176,193 @@ class Extractor:
 
             self.logger.log("File header read.")
 
-    def extract_package(self, output_dir, create_dir=True, allow_overwrites=False, skip_hash_check=False, hash_match_required=False, add_metadata_file=False):
+    def _find_volume(self, volume_id):
+
         """
 
-        :param output_dir: Directory to act as root dir found in file header
-        :param create_dir: Whether to create ' output_dir ' if it doesn't exist, if set to False and output_dir doesn't exist, NotADirectoryError is raised
-        :param allow_overwrites: Whether to overwrite if file that needs to be extracted already exists in ' output_dir ', if set to False, PyPakket4.PakketExtract.exceptions.ExtractOverwriteError is raised
-        :param skip_hash_check: Whether to skip checking hash found in file header and hash of extracted file
+        Find path of volume file named in file header, checks magic number and package id of every candidate
+
+        :param volume_id: Index of volume in volume table
+        :return: Path to volume file
+        """
+
+        if volume_id in self._volume_paths:
+            return self._volume_paths[volume_id]
+
+        volume_name = self.volume_names[volume_id]
+        mismatched = False
+
+        for volume_dir in list(self.volume_dirs or []) + [os.path.dirname(self.target_package)]:
+
+            volume_path = os.path.join(volume_dir, volume_name)
+
+            if os.path.isfile(volume_path):
+
+                with open(volume_path,'rb') as f:
+                    if f.read(MAGIC_NUM_LEN) != MAGIC_NUM or f.read(PACKAGE_ID_LEN) != self.package_id:
+                        self.logger.log("Volume ' {} ' isn't a valid PyPakket4 file or doesn't belong to this package!".format(volume_path),ERROR)
+                        mismatched = True
+                        continue
+
+                self.logger.log("Found volume ' {} ' at ' {} '".format(volume_name, volume_path), DEBUG)
+                self._volume_paths[volume_id] = volume_path
+
+                return volume_path
+
+        if mismatched:
+            raise VolumeMismatchError("Volume ' {} ' found but magic number or package id doesn't match".format(volume_name))
+
+        self.logger.log("Volume ' {} ' not found!".format(volume_name),ERROR)
+        raise MissingVolumeError("Volume ' {} ' not found, to search other directories set ' volume_dirs '".format(volume_name))
+
+    def _select_files(self, patterns=None, predicate=None):
+
+        """
+
+        Select file entries from file header, sorted by volume and base offset so every volume is read sequentially
+
+        :param patterns: Glob pattern or list of glob patterns matched against the relative path of each file (' * ' doesn't cross directories, ' ** ' matches any amount of directories), blank to select all files
+        :param predicate: Callable receiving (relative path, file entry dict), file is selected when it returns True
+        :return: List of (relative path, file entry dict) tuples
+        """
+
+        if isinstance(patterns, str):
+            patterns = [patterns]
+
+        selected = []
+
+        for file in self.target_package_contents['files']:
+
+            relpath = os.path.normpath(os.path.join(self.target_package_contents['dirs'][file['dir_id']], file['name']))
+
+            if patterns and not any(_match_path(relpath, pattern) for pattern in patterns):
+                continue
+
+            if predicate and not predicate(relpath, file):
+                continue
+
+            selected.append((relpath, file))
+
+        selected.sort(key=lambda entry: (entry[1]['volume_id'], entry[1]['base_offset_start']))
+
+        self.logger.log("Selected {}/{} files from file header".format(len(selected), len(self.target_package_contents['files'])), DEBUG)
+
+        return selected
+
+    def _read_file_chunks(self, pf, file, skip_hash_check=False, hash_match_required=False):
+
+        """
+
+        Generator yielding decrypted and inflated chunks of a file entry, checks hash once all chunks have been read
+
+        Seeks before every chunk, so generators sharing ' pf ' can be consumed interleaved
+
+        :param pf: Opened volume file containing the file entry
+        :param file: File entry dict from file header
+        """
+
+        if not skip_hash_check:
+            h = hashlib.blake2b(digest_size=32)
+
+        offset = file['base_offset_start']
+
+        for cs in file['chunksizes']:
+
+            pf.seek(offset)
+            d = inflate(decrypt(pf.read(cs),self.crypto_key,self.IV))
+            offset += cs
+
+            if not skip_hash_check:
+                h.update(d)
+
+            yield d
+
+        if not skip_hash_check and h.digest() != file['hash']:
+
+            self.logger.log(" !! File ' {} ' failed hash check, package file might have been tampered with, is corrupted or extraction failed !!".format(file['name']))
+            if hash_match_required:
+                raise HashMismatchError("File ' {} ' failed hash check, package file might have been tampered with, is corrupted or extraction failed".format(file['name']))
+
+    def iter_entries(self, patterns=None, predicate=None, as_stream=False, skip_hash_check=False, hash_match_required=False):
+
+        """
+
+        Generator yielding contents of files in package without writing anything to disk
+
+        :param patterns: Glob pattern or list of glob patterns matched against the relative path of each file (see _select_files), blank to select all files
+        :param predicate: Callable receiving (relative path, file entry dict), file is selected when it returns True
+        :param as_stream: Whether to yield a readable file-like object instead of bytes, stream can't be read anymore once the generator has moved on to another volume or has finished
+        :param skip_hash_check: Whether to skip checking hash found in file header and hash of file contents (a stream is only checked once it has been read completely)
         :param hash_match_required: Whether to raise error if hash check fails (see skip_hash_check)
-        :param add_metadata_file: Whether to add file containing metadata
 
-        :returns: Metadata, can also be accessed at Extractor.metadata
+        :returns: Generator of (relative path, bytes or stream) tuples
         """
 
         if self.closed:
             raise ExtractorClosedError("Can't extract with closed Extractor object")
 
-        self.logger.log("Extracting {}".format(self.target_package))
+        return self._iter_entries(patterns, predicate, as_stream, skip_hash_check, hash_match_required)
 
-        if not os.path.isdir(output_dir):
+    def _iter_entries(self, patterns=None, predicate=None, as_stream=False, skip_hash_check=False, hash_match_required=False):
 
-            if create_dir:
-                os.makedirs(output_dir,exist_ok=True)
-            else:
-                raise NotADirectoryError("Target is not a directory or does not exist, to create directory automatically enable ' create_dir '")
+        """
 
-        for dir in self.target_package_contents['dirs']:
+        Generator behind iter_entries, kept separate so closed Extractor is detected when iter_entries is called instead of on the first next()
+        """
 
-            os.makedirs(os.path.join(output_dir,dir),exist_ok=True)
+        pf = None
+        volume_id = None
 
-        with open(self.target_package,'rb') as pf:
+        try:
 
-            for file in self.target_package_contents['files']:
+            # Entries are sorted by volume, so only one volume is open at a time
+            for relpath, file in self._select_files(patterns, predicate):
 
-                fpath = os.path.join(output_dir,os.path.join(self.target_package_contents['dirs'][file['dir_id']],file['name']))
+                if file['volume_id'] != volume_id:
 
-                if (not os.path.exists(fpath) and not os.path.isfile(fpath)) or allow_overwrites:
+                    if pf:
+                        pf.close()
 
-                    with open(fpath,'wb') as f:
+                    volume_id = file['volume_id']
+                    pf = open(self._find_volume(volume_id),'rb')
 
-                        if not skip_hash_check:
-                            h = hashlib.blake2b(digest_size=32)
+                chunks = self._read_file_chunks(pf, file, skip_hash_check, hash_match_required)
 
-                        pf.seek(file['base_offset_start'])
+                if as_stream:
+                    yield relpath, io.BufferedReader(_ChunkStream(chunks))
+                else:
+                    yield relpath, b"".join(chunks)
 
-                        for cs in file['chunksizes']:
+                self.logger.log("File ' {} ' read.".format(file['name']), DEBUG)
 
-                            d = inflate(decrypt(pf.read(cs),self.crypto_key,self.IV))
+        finally:
 
-                            if not skip_hash_check:
-                                h.update(d)
+            if pf:
+                pf.close()
 
-                            f.write(d)
+    def _extract_volume(self, volume_id, entries, output_dir, allow_overwrites=False, skip_hash_check=False, hash_match_required=False):
+
+        """
+
+        Extract selected files from one volume, meant to be run by a volume worker thread (see extract_package)
+
+        :param volume_id: Index of volume in volume table
+        :param entries: List of (relative path, file entry dict) tuples, sorted by base offset
+        """
+
+        with open(self._find_volume(volume_id),'rb') as pf:
 
-                        if not skip_hash_check and h.digest() != file['hash']:
+            for relpath, file in entries:
 
-                            self.logger.log(" !! File ' {} ' failed hash check, package file might have been tampered with, is corrupted or extraction failed !!".format(file['name']))
-                            if hash_match_required:
-                                raise HashMismatchError("File ' {} ' failed hash check, package file might have been tampered with, is corrupted or extraction failed".format(file['name']))
+                fpath = os.path.join(output_dir,relpath)
+
+                if (not os.path.exists(fpath) and not os.path.isfile(fpath)) or allow_overwrites:
+
+                    with open(fpath,'wb') as f:
+
+                        for d in self._read_file_chunks(pf, file, skip_hash_check, hash_match_required):
+
+                            f.write(d)
 
                         self.logger.log("File ' {} ' extracted.".format(file['name']))
 
@@ -216,7 +373,63 @@ class Extractor:
                     self.logger.log("Extractor tried to extract file ' {} ' but file already exists and allow_overwrites is set to false!".format(file),ERROR)
                     raise ExtractOverwriteError("Extractor tried to extract file ' {} ' but file already exists and allow_overwrites is set to false!".format(file))
 
-        self.logger.log("All files extracted!")
+    def extract_package(self, output_dir, create_dir=True, allow_overwrites=False, skip_hash_check=False, hash_match_required=False, add_metadata_file=False, patterns=None, predicate=None, max_workers=4):
+        """
+
+        :param output_dir: Directory to act as root dir found in file header
+        :param create_dir: Whether to create ' output_dir ' if it doesn't exist, if set to False and output_dir doesn't exist, NotADirectoryError is raised
+        :param allow_overwrites: Whether to overwrite if file that needs to be extracted already exists in ' output_dir ', if set to False, PyPakket4.PakketExtract.exceptions.ExtractOverwriteError is raised
+        :param skip_hash_check: Whether to skip checking hash found in file header and hash of extracted file
+        :param hash_match_required: Whether to raise error if hash check fails (see skip_hash_check)
+        :param add_metadata_file: Whether to add file containing metadata
+        :param patterns: Glob pattern or list of glob patterns, only files with a matching relative path are extracted (' * ' doesn't cross directories, ' ** ' matches any amount of directories)
+        :param predicate: Callable receiving (relative path, file entry dict), only files for which it returns True are extracted
+        :param max_workers: Maximum amount of volumes read concurrently, each worker reads its volumes one after another, keep this around the amount of disks holding volumes
+
+        :returns: Metadata, can also be accessed at Extractor.metadata
+        """
+
+        if self.closed:
+            raise ExtractorClosedError("Can't extract with closed Extractor object")
+
+        self.logger.log("Extracting {}".format(self.target_package))
+
+        if not os.path.isdir(output_dir):
+
+            if create_dir:
+                os.makedirs(output_dir,exist_ok=True)
+            else:
+                raise NotADirectoryError("Target is not a directory or does not exist, to create directory automatically enable ' create_dir '")
+
+        selected = self._select_files(patterns, predicate)
+
+        if patterns or predicate:
+            dirs = sorted(set(self.target_package_contents['dirs'][file['dir_id']] for _, file in selected))
+        else:
+            dirs = self.target_package_contents['dirs']
+
+        for dir in dirs:
+
+            os.makedirs(os.path.join(output_dir,dir),exist_ok=True)
+
+        by_volume = {}
+
+        for relpath, file in selected:
+            by_volume.setdefault(file['volume_id'], []).append((relpath, file))
+
+        # Look up every needed volume before writing anything, unselected volumes are never touched
+        for volume_id in by_volume:
+            self._find_volume(volume_id)
+
+        # Volumes on different disks are read concurrently, capped so a package with many volumes doesn't flood one disk with random I/O
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(by_volume)))) as executor:
+
+            futures = [executor.submit(self._extract_volume, volume_id, entries, output_dir, allow_overwrites, skip_hash_check, hash_match_required) for volume_id, entries in by_volume.items()]
+
+            for future in futures:
+                future.result()
+
+        self.logger.log("{} files extracted!".format(len(selected)) if patterns or predicate else "All files extracted!")
 
         if add_metadata_file:
             self.logger.log("Creating file containing metadata...")
@@ -244,4 +457,58 @@ Extracted on: {}
         self.closed = True
 
         self.logger.log("Closing.")
-        self.logger.close()
\ No newline at end of file
+        self.logger.close()
+
+
+def _match_path(relpath, pattern):
+
+    """
+
+    Match relative path against glob pattern one path component at a time
+
+    :param relpath: Relative path of file in package
+    :param pattern: Glob pattern, ' * ' doesn't cross directories, ' ** ' matches any amount of directories
+    :return: Whether path matches pattern
+    """
+
+    return _match_parts(relpath.replace(os.sep, '/').split('/'), pattern.replace(os.sep, '/').split('/'))
+
+def _match_parts(parts, pattern_parts):
+
+    if not pattern_parts:
+        return not parts
+
+    if pattern_parts[0] == '**':
+        return any(_match_parts(parts[i:], pattern_parts[1:]) for i in range(len(parts)+1))
+
+    return bool(parts) and fnmatch.fnmatch(parts[0], pattern_parts[0]) and _match_parts(parts[1:], pattern_parts[1:])
+
+class _ChunkStream(io.RawIOBase):
+
+    """
+
+    Read-only raw stream over a generator of chunks, used by Extractor.iter_entries
+    """
+
+    def __init__(self, chunks):
+
+        self._chunks = chunks
+        self._buffer = b""
+
+    def readable(self):
+
+        return True
+
+    def readinto(self, b):
+
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+
+        return n
\ No newline at end of file
@@ -2,4 +2,9 @@
 MAGIC_NUM = b"\x0f\x0fPP4!"
 MAGIC_NUM_LEN = len(MAGIC_NUM)
 
-VERSION = 3 #16-bit unsigned int
\ No newline at end of file
+VERSION = 4 #16-bit unsigned int
+COMPATIBLE_VERSIONS = (3, 4) # Versions Extractor can read without skip_version_check
+
+MAX_VOLUMES = 0xFFFF # Volume count and volume ids are stored as 16-bit unsigned ints
+
+PACKAGE_ID_LEN = 16 # Random id written after magic number of every volume, ties volumes to their package
\ No newline at end of file
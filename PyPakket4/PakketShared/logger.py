@@ -4,6 +4,7 @@ import datetime
 from os import remove
 
 import json
+import threading
 
 colorama.init(autoreset=True)
 
@@ -23,6 +24,9 @@ class Logger:
 
         self._stealth = stealth
 
+        # Creator and Extractor log from several volume worker threads at once
+        self._lock = threading.Lock()
+
         if not stealth:
             self.log_file = open(filepath,'a')
 
@@ -42,14 +46,16 @@ class Logger:
 
             log_dict = {"type":type,"type_description":Logger.types[type][0],"content":log,"timestamp":cur_time}
 
-            self.log_file.write(json.dumps(log_dict)+'\n')
-            self.log_file.flush()
-
             log_text = "[{}] {}".format(Logger.types[type][0],log)
 
-            if self.print_logs:
-                if type != DEBUG or self.print_debug:
-                    print(Logger.types[type][1]+log_text)
+            with self._lock:
+
+                self.log_file.write(json.dumps(log_dict)+'\n')
+                self.log_file.flush()
+
+                if self.print_logs:
+                    if type != DEBUG or self.print_debug:
+                        print(Logger.types[type][1]+log_text)
 
     def close(self):
 
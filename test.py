@@ -10,3 +10,93 @@ print("--- TEST BORDER ---")
 px = PakketExtract.extractor.Extractor("TestDir.pyp4",crypto_key="TestKey")
 px.extract_package("TestDir_extract",allow_overwrites=True,add_metadata_file=True)
 px.close()
+
+
+print("--- TEST BORDER ---")
+
+import os
+
+def read_original(relpath):
+    with open(os.path.join("TestDir",relpath),'rb') as f:
+        return f.read()
+
+px = PakketExtract.extractor.Extractor("TestDir.pyp4",crypto_key="TestKey")
+
+px.extract_package("TestDir_extract_selective",allow_overwrites=True,hash_match_required=True,patterns="SubDir1/*")
+assert sorted(os.listdir("TestDir_extract_selective/SubDir1")) == ["TestSubFile1","TestSubFile2"]
+assert not os.path.exists("TestDir_extract_selective/TestFile1")
+
+px.extract_package("TestDir_extract_predicate",allow_overwrites=True,hash_match_required=True,predicate=lambda relpath, entry: entry['name'] == "TestSubSubFile1")
+assert os.listdir("TestDir_extract_predicate/SubDir1/SubDir1_2") == ["TestSubSubFile1"]
+assert not os.path.exists("TestDir_extract_predicate/TestFile1")
+
+entries = dict(px.iter_entries(hash_match_required=True))
+assert len(entries) == 4
+for relpath, data in entries.items():
+    assert data == read_original(relpath)
+
+assert [relpath for relpath, _ in px.iter_entries(patterns="SubDir1/**")] == [relpath for relpath in entries if relpath.startswith("SubDir1")]
+
+entries_iter = px.iter_entries(patterns=["SubDir1/TestSubFile2","SubDir1/SubDir1_2/*"],as_stream=True,hash_match_required=True)
+relpath_a, stream_a = next(entries_iter)
+data_a = stream_a.read(10)
+relpath_b, stream_b = next(entries_iter)
+data_b = stream_b.read(10)
+data_a += stream_a.read()
+data_b += stream_b.read()
+assert data_a == read_original(relpath_a)
+assert data_b == read_original(relpath_b)
+entries_iter.close()
+
+px.close()
+
+
+print("--- TEST BORDER ---")
+
+os.makedirs("TestDir_volumes1",exist_ok=True)
+os.makedirs("TestDir_volumes2",exist_ok=True)
+
+p = PakketCreate.creator.Creator("TestDir")
+p.create_package_file("TestDir_sharded.pyp4",encryption_key="TestKey",allow_overwrite=True,volumes=20,volume_dirs=["TestDir_volumes1","TestDir_volumes2"],max_workers=2)
+p.create_package_file("TestDir_split.pyp4",encryption_key="TestKey",allow_overwrite=True,volume_input_size=100,volume_dirs=["TestDir_volumes1","TestDir_volumes2"])
+p.close()
+
+assert sorted(os.listdir("TestDir_volumes1")) == ["TestDir_sharded.pyp4.v001","TestDir_sharded.pyp4.v003","TestDir_split.pyp4.v001"]
+assert sorted(os.listdir("TestDir_volumes2")) == ["TestDir_sharded.pyp4.v002","TestDir_split.pyp4.v002"]
+
+for package in ("TestDir_sharded.pyp4","TestDir_split.pyp4"):
+
+    px = PakketExtract.extractor.Extractor(package,crypto_key="TestKey",volume_dirs=["TestDir_volumes1","TestDir_volumes2"])
+    px.extract_package(package+"_extract",allow_overwrites=True,hash_match_required=True,max_workers=2)
+    for relpath, data in px.iter_entries(hash_match_required=True):
+        assert data == read_original(relpath)
+        with open(os.path.join(package+"_extract",relpath),'rb') as f:
+            assert f.read() == data
+    px.close()
+
+    # Volumes are only needed once a selected file lives in them
+    px = PakketExtract.extractor.Extractor(package,crypto_key="TestKey")
+    assert dict(px.iter_entries(predicate=lambda relpath, entry: entry['volume_id'] == 0))
+    try:
+        px.extract_package(package+"_extract",allow_overwrites=True)
+        raise AssertionError("Missing volume wasn't detected")
+    except PakketExtract.exceptions.MissingVolumeError:
+        pass
+    px.close()
+
+# Volume of another package with the same name is rejected
+os.replace("TestDir_volumes1/TestDir_split.pyp4.v001","TestDir_volumes1/TestDir_sharded.pyp4.v001")
+px = PakketExtract.extractor.Extractor("TestDir_sharded.pyp4",crypto_key="TestKey",volume_dirs=["TestDir_volumes1","TestDir_volumes2"])
+try:
+    list(px.iter_entries())
+    raise AssertionError("Mismatching volume wasn't detected")
+except PakketExtract.exceptions.VolumeMismatchError:
+    pass
+px.close()
+
+# Closed Extractor is detected when iter_entries is called, not on the first next()
+try:
+    px.iter_entries()
+    raise AssertionError("Closed Extractor wasn't detected")
+except PakketExtract.exceptions.ExtractorClosedError:
+    pass